@@ -11,7 +11,7 @@ import numcodecs
 import ujson
 import zarr
 
-from kerchunk.utils import consolidate
+from kerchunk.utils import consolidate, write_refs
 
 logger = logging.getLogger("kerchunk.combine")
 
@@ -142,6 +142,7 @@ class MultiZarrToZarr:
         self.postprocess = postprocess
         self.out = out or {}
         self.done = set()
+        self._values = {}  # (input index, coord) -> value found in first pass
 
     @property
     def fss(self):
@@ -256,6 +257,7 @@ class MultiZarrToZarr:
             z = zarr.open_group(fs.get_mapper(""))
             for var in self.concat_dims:
                 value = self._get_value(i, z, var, fn=self._paths[i])
+                self._values[(i, var)] = value
                 if isinstance(value, np.ndarray):
                     value = value.ravel()
                 if isinstance(value, (np.ndarray, tuple, list)):
@@ -360,9 +362,13 @@ class MultiZarrToZarr:
                 all_deps = set(sum(deps, []))
                 no_deps = set(self.coo_map) - all_deps
 
-            # Coordinate values for the whole of this dataset
+            # Coordinate values for the whole of this dataset, reusing those already
+            # derived in the first pass, which may have needed data loads
             cvalues = {
-                c: self._get_value(i, z, c, fn=self._paths[i]) for c in self.coo_map
+                c: self._values[(i, c)]
+                if (i, c) in self._values
+                else self._get_value(i, z, c, fn=self._paths[i])
+                for c in self.coo_map
             }
             var = cvalues.get("var", None)
             for c, cv in cvalues.copy().items():
@@ -451,31 +457,36 @@ class MultiZarrToZarr:
                     k = self.out[f"{var or v}/.zarray"]
                     ch = ujson.loads(k)["chunks"]
 
+                # for each output dimension: which input key part it comes from
+                # (if any), and the chunk offset from this dataset's position along
+                # a concat coordinate (if any); these are the same for every chunk
+                key_plan = []
+                for loc, c in enumerate(coord_order):
+                    part = coords.index(c) if c in coords else None
+                    if c in self.coos:
+                        ind = np.searchsorted(self.coos[c], cvalues[c])
+                        key_plan.append((part, ind // ch[loc]))
+                    else:
+                        key_plan.append((part, None))
+
                 for fn in fns:
                     # loop over the chunks and copy the references
                     if ".z" in fn:
                         continue
                     key_parts = fn.split("/")[-1].split(".")
-                    key = f"{var or v}/"
-                    for loc, c in enumerate(coord_order):
-                        if c in self.coos:
-                            cv = cvalues[c]
-                            ind = np.searchsorted(self.coos[c], cv)
-                            if c in coords:
-                                key += str(
-                                    ind // ch[loc] + int(key_parts[coords.index(c)])
-                                )
-                            else:
-                                key += str(ind // ch[loc])
-                        else:
-                            key += key_parts[coords.index(c)]
-                        key += "."
-                    key = key.rstrip(".")
+                    key = f"{var or v}/" + ".".join(
+                        key_parts[part]
+                        if base is None
+                        else str(base if part is None else base + int(key_parts[part]))
+                        for part, base in key_plan
+                    )
 
                     ref = fs.references.get(fn)
                     if isinstance(ref, list) and (
-                        (len(ref) > 1 and ref[2] < self.inline)
-                        or fs.info(fn)["size"] < self.inline
+                        # only look up the size of whole-file references
+                        ref[2] < self.inline
+                        if len(ref) > 1
+                        else fs.info(fn)["size"] < self.inline
                     ):
                         to_download[key] = fn
                     else:
@@ -507,7 +518,7 @@ class MultiZarrToZarr:
             return out
         else:
             with fsspec.open(filename, mode="wt", **(storage_options or {})) as f:
-                ujson.dump(out, f)
+                write_refs(out, f)
 
 
 def _reorganise(coos):
@@ -2,22 +2,10 @@ import base64
 import logging
 
 import ujson
-import pandas as pd
 import fsspec
 import zarr
 
 
-# example from preffs's README'
-df = pd.DataFrame(
-    {
-        "key": ["a/b", "a/b", "b"],
-        "path": ["a.dat", "b.dat", None],
-        "offset": [123, 12, 0],
-        "size": [12, 17, 0],
-        "raw": [None, None, b"data"],
-    }
-)
-
 logger = logging.getLogger("kerchunk.df")
 
 
@@ -29,6 +17,21 @@ def _proc_raw(r):
     return r
 
 
+def _ref_order(key):
+    """Sort key putting metadata first, then each variable's chunks in index order
+
+    This is the order in which LazyReferenceMapper fills its records, so that at
+    most one partially filled record per variable is held in memory.
+    """
+    field, _, chunk = key.rpartition("/")
+    if field and not chunk.startswith(".z"):
+        try:
+            return 1, field, tuple(int(c) for c in chunk.split("."))
+        except ValueError:
+            pass
+    return 0, key, ()
+
+
 def get_variables(refs, consolidated=True):
     """Get list of variable names from references.
 
@@ -155,6 +158,6 @@ def refs_to_dataframe(
         record_size, root=url, fs=fs, categorical_threshold=categorical_threshold
     )
 
-    for k in sorted(refs):
+    for k in sorted(refs, key=_ref_order):
         out[k] = refs[k]
     out.flush()
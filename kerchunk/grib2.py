@@ -1,5 +1,8 @@
 import base64
+import concurrent.futures
+import functools
 import logging
+import os
 
 try:
     import cfgrib
@@ -244,7 +247,9 @@ def example_combine(
 ):  # pragma: no cover
     """Create combined dataset of weather measurements at 2m height
 
-    Ten consecutive timepoints from ten 120MB files on s3.
+    Ten consecutive timepoints from ten 120MB files on s3. The files are scanned
+    in worker processes, so on platforms that spawn them (macOS, Windows) the
+    calling script needs an ``if __name__ == "__main__":`` guard.
     Example usage:
 
     >>> tot = example_combine()
@@ -267,7 +272,12 @@ def example_combine(
     ]
     so = {"anon": True, "default_cache_type": "readahead"}
 
-    out = [scan_grib(u, storage_options=so, filter=filter) for u in files]
+    # each scan is independent, so run them concurrently; processes rather than
+    # threads, since ecCodes is not necessarily built thread-safe
+    scan = functools.partial(scan_grib, storage_options=so, filter=filter)
+    workers = min(len(files), os.cpu_count() or 1)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as ex:
+        out = ex.map(scan, files)
     out = sum(out, [])
     mzz = MultiZarrToZarr(
         out,
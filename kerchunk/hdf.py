@@ -1,5 +1,7 @@
 import base64
+import itertools
 import logging
+import warnings
 from typing import Union, BinaryIO
 
 import fsspec.core
@@ -21,6 +23,7 @@ except ModuleNotFoundError:  # pragma: no cover
     )
 
 lggr = logging.getLogger("h5-to-zarr")
+_warned_chunk_iter = False  # the slow-scan warning is only given once
 _HIDDEN_ATTRS = {  # from h5netcdf.attrs
     "REFERENCE_LIST",
     "CLASS",
@@ -90,12 +93,15 @@ class SingleHdf5ToZarr:
         if vlen_encode not in ["embed", "null", "leave", "encode"]:
             raise NotImplementedError
         self.vlen = vlen_encode
-        self._h5f = h5py.File(self.input_file, mode="r")
+        # only metadata is read during the scan, so no raw-data chunk cache
+        self._h5f = h5py.File(self.input_file, mode="r", rdcc_nbytes=0)
 
         self.store = {}
         self._zroot = zarr.group(store=self.store, overwrite=True)
 
         self._uri = url
+        self._refs = _ChunkTable([url])
+        self._fill_cache = {}
         self.error = error
         lggr.debug(f"HDF5 file URI: {self._uri}")
 
@@ -117,6 +123,8 @@ class SingleHdf5ToZarr:
         self._h5f.visititems(self._translator)
         if self.inline > 0:
             self._do_inline(self.inline)
+        self.store.update(self._refs.items())
+        self._refs.clear()
         if self.spec < 1:
             return self.store
         else:
@@ -134,16 +142,21 @@ class SingleHdf5ToZarr:
         length may be larger than threshold.
         """
         # TODO: use version in utils
-        for k, v in self.store.copy().items():
-            if isinstance(v, list) and v[2] < threshold:
-                self.input_file.seek(v[1])
-                data = self.input_file.read(v[2])
-                try:
-                    # easiest way to test if data is ascii
-                    data.decode("ascii")
-                except UnicodeDecodeError:
-                    data = b"base64:" + base64.b64encode(data)
-                self.store[k] = data
+        refs = self._refs
+        (rows,) = np.nonzero(refs.sizes < threshold)
+        if not len(rows):
+            return
+        rows = rows[np.argsort(refs.offsets[rows], kind="stable")]
+        starts = refs.offsets[rows].tolist()
+        ends = (refs.offsets[rows] + refs.sizes[rows]).tolist()
+        for row, data in zip(rows, _read_ranges(self.input_file, starts, ends)):
+            try:
+                # easiest way to test if data is ascii
+                data.decode("ascii")
+            except UnicodeDecodeError:
+                data = b"base64:" + base64.b64encode(data)
+            self.store[refs.keys[row]] = data
+        refs.drop(rows)
 
     def _transfer_attrs(
         self,
@@ -160,6 +173,7 @@ class SingleHdf5ToZarr:
             An equivalent Zarr group or array to the HDF5 group or dataset with
             attributes.
         """
+        attrs = {}
         for n, v in h5obj.attrs.items():
             if n in _HIDDEN_ATTRS:
                 continue
@@ -168,26 +182,51 @@ class SingleHdf5ToZarr:
             if isinstance(v, bytes):
                 v = v.decode("utf-8") or " "
             elif isinstance(v, (np.ndarray, np.number, np.bool_)):
-                if v.dtype.kind == "S":
-                    v = v.astype(str)
                 if n == "_FillValue":
                     continue  # strip it out!
-                elif v.size == 1:
+                if v.dtype.kind == "S":
+                    v = v.astype(str)
+                if v.size != 1:
+                    v = v.tolist()
+                elif v.dtype.kind == "V":
                     v = v.flatten()[0]
-                    if isinstance(v, (np.ndarray, np.number, np.bool_)):
-                        v = v.tolist()
                 else:
-                    v = v.tolist()
+                    # single python scalar, without making an intermediate list
+                    v = v.item()
             elif isinstance(v, h5py._hl.base.Empty):
                 v = ""
-            if v == "DIMENSION_SCALE":
+            if isinstance(v, str) and v == "DIMENSION_SCALE":
+                # plain string test: comparing arrays or compound values to a
+                # str is elementwise, or raises
                 continue
-            try:
-                zobj.attrs[n] = v
-            except TypeError:
-                lggr.debug(
-                    f"TypeError transferring attr, skipping:\n {n}@{h5obj.name} = {v} ({type(v)})"
-                )
+            attrs[n] = v
+
+        # every write re-serialises the whole .zattrs, so set all in one go and
+        # only fall back to one-by-one to find and skip unencodable values
+        if not attrs:
+            return
+        try:
+            zobj.attrs.update(attrs)
+        except TypeError:
+            for n, v in attrs.items():
+                try:
+                    zobj.attrs[n] = v
+                except TypeError:
+                    lggr.debug(
+                        f"TypeError transferring attr, skipping:\n {n}@{h5obj.name} = {v} ({type(v)})"
+                    )
+
+    def _encode_fill_value(self, v, dtype):
+        """zarr's encode_fill_value, memoized on dtype and value
+
+        Many arrays in a file typically share the same _FillValue.
+        """
+        if not isinstance(v, (np.ndarray, np.generic)) or v.dtype.kind == "O":
+            return encode_fill_value(v, dtype)
+        key = (str(dtype), v.dtype.str, v.tobytes())
+        if key not in self._fill_cache:
+            self._fill_cache[key] = encode_fill_value(v, dtype)
+        return self._fill_cache[key]
 
     def _translator(self, name: str, h5obj: Union[h5py.Dataset, h5py.Group]):
         """Produce Zarr metadata for all groups and datasets in the HDF5 file."""
@@ -195,7 +234,18 @@ class SingleHdf5ToZarr:
             kwargs = {}
             if isinstance(h5obj, h5py.Dataset):
                 lggr.debug(f"HDF5 dataset: {h5obj.name}")
-                if h5obj.id.get_create_plist().get_layout() == h5py.h5d.COMPACT:
+                # query the creation property list once, rather than through the
+                # h5py properties, each of which re-reads the whole filter pipeline
+                dcpl = h5obj.id.get_create_plist()
+                h5filters = {}
+                for i in range(dcpl.get_nfilters()):
+                    code, _, vals, _ = dcpl.get_filter(i)
+                    h5filters[code] = vals
+                has_shuffle = h5py.h5z.FILTER_SHUFFLE in h5filters
+                has_fletcher32 = h5py.h5z.FILTER_FLETCHER32 in h5filters
+                dtype = h5obj.dtype
+                shape = h5obj.shape
+                if dcpl.get_layout() == h5py.h5d.COMPACT:
                     # Only do if h5obj.nbytes < self.inline??
                     kwargs["data"] = h5obj[:]
 
@@ -203,31 +253,36 @@ class SingleHdf5ToZarr:
                     #
                     # check for unsupported HDF encoding/filters
                     #
-                    if h5obj.scaleoffset:
+                    if h5py.h5z.FILTER_SCALEOFFSET in h5filters:
                         raise RuntimeError(
                             f"{h5obj.name} uses HDF5 scaleoffset filter - not supported by kerchunk"
                         )
-                    if h5obj.compression in ("szip", "lzf"):
+                    if (
+                        h5py.h5z.FILTER_SZIP in h5filters
+                        or h5py.h5z.FILTER_LZF in h5filters
+                    ):
                         raise RuntimeError(
                             f"{h5obj.name} uses szip or lzf compression - not supported by kerchunk"
                         )
-                    if h5obj.compression == "gzip":
-                        compression = numcodecs.Zlib(level=h5obj.compression_opts)
+                    if h5py.h5z.FILTER_DEFLATE in h5filters:
+                        compression = numcodecs.Zlib(
+                            level=h5filters[h5py.h5z.FILTER_DEFLATE][0]
+                        )
                     else:
                         compression = None
                 filters = []
                 dt = None
                 # Get storage info of this HDF5 dataset...
-                cinfo = self._storage_info(h5obj)
+                ckeys, coffsets, csizes = self._storage_arrays(h5obj)
 
                 if "data" in kwargs:
                     fill = None
                     compression = None
                 else:
                     # encodings
-                    if h5obj.dtype.kind in "US":
+                    if dtype.kind in "US":
                         fill = h5obj.fillvalue or " "  # cannot be None
-                    elif h5obj.dtype.kind == "O":
+                    elif dtype.kind == "O":
                         if self.vlen == "embed":
                             if np.isscalar(h5obj):
                                 out = str(h5obj)
@@ -260,9 +315,10 @@ class SingleHdf5ToZarr:
                             dt = "S16"
                             fill = " "
                         elif self.vlen == "encode":
-                            assert len(cinfo) == 1
-                            v = list(cinfo.values())[0]
-                            data = _read_block(self.input_file, v["offset"], v["size"])
+                            assert len(coffsets) == 1
+                            data = _read_block(
+                                self.input_file, int(coffsets[0]), int(csizes[0])
+                            )
                             indexes = np.frombuffer(data, dtype="S16")
                             labels = h5obj[:]
                             mapping = {
@@ -279,23 +335,20 @@ class SingleHdf5ToZarr:
                         fill = None
                     else:
                         fill = h5obj.fillvalue
-                    if h5obj.dtype.kind == "V":
+                    if dtype.kind == "V":
                         fill = None
                         if self.vlen == "encode":
-                            assert len(cinfo) == 1
-                            v = list(cinfo.values())[0]
+                            assert len(coffsets) == 1
                             dt = [
                                 (
                                     v,
-                                    (
-                                        "S16"
-                                        if h5obj.dtype[v].kind == "O"
-                                        else str(h5obj.dtype[v])
-                                    ),
+                                    ("S16" if dtype[v].kind == "O" else str(dtype[v])),
                                 )
-                                for v in h5obj.dtype.names
+                                for v in dtype.names
                             ]
-                            data = _read_block(self.input_file, v["offset"], v["size"])
+                            data = _read_block(
+                                self.input_file, int(coffsets[0]), int(csizes[0])
+                            )
                             labels = h5obj[:]
                             arr = np.frombuffer(data, dtype=dt)
                             mapping = {}
@@ -315,49 +368,33 @@ class SingleHdf5ToZarr:
                             dt = [
                                 (
                                     v,
-                                    (
-                                        "O"
-                                        if h5obj.dtype[v].kind == "O"
-                                        else str(h5obj.dtype[v])
-                                    ),
+                                    ("O" if dtype[v].kind == "O" else str(dtype[v])),
                                 )
-                                for v in h5obj.dtype.names
+                                for v in dtype.names
                             ]
                         elif self.vlen == "null":
                             dt = [
                                 (
                                     v,
-                                    (
-                                        "S16"
-                                        if h5obj.dtype[v].kind == "O"
-                                        else str(h5obj.dtype[v])
-                                    ),
+                                    ("S16" if dtype[v].kind == "O" else str(dtype[v])),
                                 )
-                                for v in h5obj.dtype.names
+                                for v in dtype.names
                             ]
                             kwargs["object_codec"] = FillStringsCodec(dtype=str(dt))
                             dt = [
                                 (
                                     v,
-                                    (
-                                        "O"
-                                        if h5obj.dtype[v].kind == "O"
-                                        else str(h5obj.dtype[v])
-                                    ),
+                                    ("O" if dtype[v].kind == "O" else str(dtype[v])),
                                 )
-                                for v in h5obj.dtype.names
+                                for v in dtype.names
                             ]
                         elif self.vlen == "leave":
                             dt = [
                                 (
                                     v,
-                                    (
-                                        "S16"
-                                        if h5obj.dtype[v].kind == "O"
-                                        else h5obj.dtype[v]
-                                    ),
+                                    ("S16" if dtype[v].kind == "O" else dtype[v]),
                                 )
-                                for v in h5obj.dtype.names
+                                for v in dtype.names
                             ]
                         elif self.vlen == "embed":
                             # embed fails due to https://github.com/zarr-developers/numcodecs/issues/333
@@ -381,24 +418,21 @@ class SingleHdf5ToZarr:
                         else:
                             raise NotImplementedError
                     # Add filter for shuffle
-                    if h5obj.shuffle and h5obj.dtype.kind != "O":
+                    if has_shuffle and dtype.kind != "O":
                         # cannot use shuffle if we materialised objects
-                        filters.append(
-                            numcodecs.Shuffle(elementsize=h5obj.dtype.itemsize)
-                        )
+                        filters.append(numcodecs.Shuffle(elementsize=dtype.itemsize))
 
-                    if h5py.h5ds.is_scale(h5obj.id) and not cinfo:
+                    if h5py.h5ds.is_scale(h5obj.id) and not len(coffsets):
                         return
-                    if h5obj.attrs.get("_FillValue") is not None:
-                        fill = encode_fill_value(
-                            h5obj.attrs.get("_FillValue"), dt or h5obj.dtype
-                        )
+                    fillvalue = h5obj.attrs.get("_FillValue")
+                    if fillvalue is not None:
+                        fill = self._encode_fill_value(fillvalue, dt or dtype)
 
                 # Create a Zarr array equivalent to this HDF5 dataset...
                 za = self._zroot.create_dataset(
                     h5obj.name,
-                    shape=h5obj.shape,
-                    dtype=dt or h5obj.dtype,
+                    shape=shape,
+                    dtype=dt or dtype,
                     chunks=h5obj.chunks or False,
                     fill_value=fill,
                     compression=compression,
@@ -416,16 +450,18 @@ class SingleHdf5ToZarr:
                     return  # embedded bytes, no chunks to copy
 
                 # Store chunk location metadata...
-                if cinfo:
-                    for k, v in cinfo.items():
-                        if h5obj.fletcher32:
-                            logging.info("Discarding fletcher32 checksum")
-                            v["size"] -= 4
-                        self.store[za._chunk_key(k)] = [
-                            self._uri,
-                            v["offset"],
-                            v["size"],
-                        ]
+                if len(coffsets):
+                    if has_fletcher32:
+                        logging.info("Discarding fletcher32 checksum")
+                        csizes -= 4
+                    # same as za._chunk_key, but straight from the index rows
+                    prefix = za._key_prefix
+                    sep = za._dimension_separator or "."
+                    self._refs.extend(
+                        [prefix + sep.join(map(str, k)) for k in ckeys.tolist()],
+                        coffsets,
+                        csizes,
+                    )
 
             elif isinstance(h5obj, h5py.Group):
                 lggr.debug(f"HDF5 group: {h5obj.name}")
@@ -450,8 +486,6 @@ class SingleHdf5ToZarr:
                 pdb.post_mortem()
             else:
                 # "warn" or anything else, the default
-                import warnings
-
                 warnings.warn(msg)
             del e  # garbage collect
 
@@ -500,7 +534,8 @@ class SingleHdf5ToZarr:
         """Get storage information of an HDF5 dataset in the HDF5 file.
 
         Storage information consists of file offset and size (length) for every
-        chunk of the HDF5 dataset.
+        chunk of the HDF5 dataset. Translation itself uses ``_storage_arrays``;
+        this dict form is kept for code outside kerchunk that relies on it.
 
         Parameters
         ----------
@@ -514,47 +549,164 @@ class SingleHdf5ToZarr:
             as tuples. Dict values are pairs with chunk file offset and size
             integers.
         """
-        # Empty (null) dataset...
-        if dset.shape is None:
-            return dict()
+        keys, offsets, sizes = self._storage_arrays(dset)
+        return {
+            key: {"offset": offset, "size": size}
+            for key, offset, size in zip(
+                map(tuple, keys.tolist()), offsets.tolist(), sizes.tolist()
+            )
+        }
 
+    def _storage_arrays(self, dset: h5py.Dataset):
+        """Get storage information of an HDF5 dataset as arrays.
+
+        As ``_storage_info``, but without building a dict entry per chunk.
+
+        Parameters
+        ----------
+        dset : h5py.Dataset
+            HDF5 dataset for which to collect storage information.
+
+        Returns
+        -------
+        keys : np.ndarray
+            Chunk array offsets, int64 of shape (number of chunks, ndim or 1)
+        offsets, sizes : np.ndarray
+            Chunk file offsets and sizes, uint64 of length number of chunks
+        """
+        ndim = len(dset.shape or ()) or 1
         dsid = dset.id
         if dset.chunks is None:
-            # Contiguous dataset...
-            if dsid.get_offset() is None:
+            # Contiguous dataset, or empty (null) dataset...
+            offset = None if dset.shape is None else dsid.get_offset()
+            if offset is None:
                 # No data ever written...
-                return dict()
+                num_chunks = 0
             else:
-                key = (0,) * (len(dset.shape) or 1)
-                return {
-                    key: {"offset": dsid.get_offset(), "size": dsid.get_storage_size()}
-                }
+                return (
+                    np.zeros((1, ndim), dtype=np.int64),
+                    np.array([offset], dtype=np.uint64),
+                    np.array([dsid.get_storage_size()], dtype=np.uint64),
+                )
         else:
             # Chunked dataset...
             num_chunks = dsid.get_num_chunks()
-            if num_chunks == 0:
-                # No data ever written...
-                return dict()
 
-            # Go over all the dataset chunks...
-            stinfo = dict()
-            chunk_size = dset.chunks
+        # Go over all the dataset chunks, filling pre-sized arrays...
+        coords = np.empty((num_chunks, ndim), dtype=np.int64)
+        # unsigned 64-bit, like HDF5's haddr_t and hsize_t
+        offsets = np.empty(num_chunks, dtype=np.uint64)
+        sizes = np.empty(num_chunks, dtype=np.uint64)
+        if num_chunks == 0:
+            # No data ever written...
+            return coords, offsets, sizes
+        counter = iter(range(num_chunks))
+
+        def store_chunk_info(blob):
+            i = next(counter)
+            coords[i] = blob.chunk_offset
+            offsets[i] = blob.byte_offset
+            sizes[i] = blob.size
+
+        has_chunk_iter = callable(getattr(dsid, "chunk_iter", None))
+
+        if has_chunk_iter:
+            dsid.chunk_iter(store_chunk_info)
+        else:
+            # the python loop restarts the B-tree walk for every index, which
+            # is very slow for datasets with many chunks
+            global _warned_chunk_iter
+            if not _warned_chunk_iter:
+                _warned_chunk_iter = True
+                warnings.warn(
+                    "h5py.h5d.DatasetID.chunk_iter is not available (requires "
+                    "h5py>=3.8 and HDF5>=1.12.3); falling back to slow per-chunk "
+                    "scanning"
+                )
+            for index in range(num_chunks):
+                store_chunk_info(dsid.get_chunk_info(index))
 
-            def get_key(blob):
-                return tuple([a // b for a, b in zip(blob.chunk_offset, chunk_size)])
+        return coords // np.asarray(dset.chunks, dtype=np.int64), offsets, sizes
 
-            def store_chunk_info(blob):
-                stinfo[get_key(blob)] = {"offset": blob.byte_offset, "size": blob.size}
 
-            has_chunk_iter = callable(getattr(dsid, "chunk_iter", None))
+class _ChunkTable:
+    """Chunk references held as struct-of-arrays
 
-            if has_chunk_iter:
-                dsid.chunk_iter(store_chunk_info)
-            else:
-                for index in range(num_chunks):
-                    store_chunk_info(dsid.get_chunk_info(index))
+    Rather than one ``[url, offset, size]`` list per chunk, keys are kept in a
+    list and offsets, sizes and indices into the ``urls`` table in growable
+    numpy arrays. Reference lists are only made by ``items()``, at output time.
 
-            return stinfo
+    ``SingleHdf5ToZarr`` only ever uses one URL; ``url_idx`` exists so that a
+    table can also describe chunks spread across several files.
+    """
+
+    def __init__(self, urls, capacity=1024):
+        self.urls = list(urls)
+        self._capacity = capacity
+        self.clear()
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def offsets(self):
+        return self._offsets[: len(self)]
+
+    @property
+    def sizes(self):
+        return self._sizes[: len(self)]
+
+    @property
+    def url_idx(self):
+        return self._url_idx[: len(self)]
+
+    def _reserve(self, n):
+        need = len(self) + n
+        if need > len(self._offsets):
+            capacity = max(need, 2 * len(self._offsets))
+            for name in ["_offsets", "_sizes", "_url_idx"]:
+                old = getattr(self, name)
+                new = np.empty(capacity, dtype=old.dtype)
+                new[: len(self)] = old[: len(self)]
+                setattr(self, name, new)
+
+    def extend(self, keys, offsets, sizes, url_idx=0):
+        n = len(keys)
+        self._reserve(n)
+        start = len(self)
+        self._offsets[start : start + n] = offsets
+        self._sizes[start : start + n] = sizes
+        self._url_idx[start : start + n] = url_idx
+        self.keys.extend(keys)
+
+    def drop(self, rows):
+        """Remove the references at the given row indices"""
+        keep = np.ones(len(self), dtype=bool)
+        keep[rows] = False
+        n = int(keep.sum())
+        for name in ["_offsets", "_sizes", "_url_idx"]:
+            arr = getattr(self, name)
+            arr[:n] = arr[: len(self)][keep]
+        self.keys = [k for k, kept in zip(self.keys, keep.tolist()) if kept]
+
+    def clear(self):
+        """Remove all references, releasing grown buffers"""
+        self.keys = []
+        self._offsets = np.empty(self._capacity, dtype="uint64")
+        self._sizes = np.empty(self._capacity, dtype="uint64")
+        self._url_idx = np.empty(self._capacity, dtype="uint32")
+
+    def items(self):
+        """Iterate over (key, [url, offset, size]) pairs"""
+        if len(self.urls) == 1:
+            # every row points at the same file; no per-row lookup needed
+            urls = itertools.repeat(self.urls[0])
+        else:
+            urls = np.array(self.urls, dtype=object)[self.url_idx].tolist()
+        for key, url, offset, size in zip(
+            self.keys, urls, self.offsets.tolist(), self.sizes.tolist()
+        ):
+            yield key, [url, offset, size]
 
 
 def _simple_type(x):
@@ -575,6 +727,72 @@ def _read_block(open_file, offset, size):
     return data
 
 
+def _merge_ranges(starts, ends, max_gap, max_block):
+    """Group sorted byte ranges into blocks to be read in one request
+
+    A range joins the previous block only if the gap before it is no larger than
+    ``max_gap`` or than the requested bytes in the block so far, and the block
+    stays within ``max_block`` bytes. So at most about half of what is read lies
+    between the wanted ranges, however the chunks are laid out.
+    """
+    bstarts, bends = [], []
+    wanted = 0
+    for start, end in zip(starts, ends):
+        if bstarts:
+            gap = start - bends[-1]
+            if gap <= min(max_gap, wanted) and end - bstarts[-1] <= max_block:
+                bends[-1] = max(bends[-1], end)
+                wanted += end - start
+                continue
+        bstarts.append(start)
+        bends.append(end)
+        wanted = end - start
+    return bstarts, bends
+
+
+def _read_ranges(open_file, starts, ends, max_gap=2**16, max_block=2**22):
+    """Fetch many byte ranges of one file, coalescing those that are close
+
+    ``starts`` must be sorted. Nearby ranges are fetched as a single block (see
+    ``_merge_ranges``). If ``open_file`` is an fsspec file, all the blocks are
+    requested together with ``cat_ranges``, which is concurrent for async
+    (remote) filesystems; otherwise they are read in order, seeking only where
+    needed. ``cat_ranges`` works on the path, so a file pinned to an S3
+    ``version_id`` is read through the file object instead.
+    """
+    bstarts, bends = _merge_ranges(starts, ends, max_gap, max_block)
+    fs = getattr(open_file, "fs", None)
+    if (
+        fs is not None
+        and getattr(open_file, "path", None)
+        and getattr(open_file, "version_id", None) is None
+    ):
+        blocks = fs.cat_ranges([open_file.path] * len(bstarts), bstarts, bends)
+        for b in blocks:
+            # async filesystems return failures in place of the data
+            if isinstance(b, Exception):
+                raise b
+    else:
+        blocks = []
+        place = open_file.tell()
+        pos = None
+        for start, end in zip(bstarts, bends):
+            if start != pos:
+                open_file.seek(start)
+            blocks.append(open_file.read(end - start))
+            pos = end
+        open_file.seek(place)
+
+    out = []
+    block = 0
+    for start, end in zip(starts, ends):
+        while end > bends[block]:
+            block += 1
+        offset = bstarts[block]
+        out.append(blocks[block][start - offset : end - offset])
+    return out
+
+
 def _is_netcdf_datetime(dataset: h5py.Dataset):
     units = dataset.attrs.get("units")
     if isinstance(units, bytes):
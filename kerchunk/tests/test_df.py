@@ -5,7 +5,7 @@ fastparquet = pytest.importorskip("fastparquet")
 import fsspec
 import ujson
 
-from kerchunk.df import refs_to_dataframe
+from kerchunk.df import refs_to_dataframe, _ref_order
 
 
 @pytest.mark.parametrize("url", [True, False])
@@ -62,3 +62,16 @@ def test_1(m, url):
         "raw": {0: None, 1: None, 2: b"data", 3: None},
         "size": {0: 0, 1: 0, 2: 0, 3: 0},
     }
+
+
+def test_ref_order():
+    keys = ["b/.zattrs", "a/10.0", "a/2.1", ".zgroup", "a/2.0", "a/.zarray", "b/3"]
+    assert sorted(keys, key=_ref_order) == [
+        ".zgroup",
+        "a/.zarray",
+        "b/.zattrs",
+        "a/2.0",
+        "a/2.1",
+        "a/10.0",
+        "b/3",
+    ]
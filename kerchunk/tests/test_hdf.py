@@ -306,3 +306,248 @@ def test_embed():
         "0.004609216572327277",
         "0.01298182345556785",
     ]
+
+
+def test_multi_chunk(tmpdir):
+    import h5py
+
+    fn = str(tmpdir.join("chunks.h5"))
+    data = np.arange(600, dtype="int32").reshape(20, 30)
+    with h5py.File(fn, "w") as f:
+        f.create_dataset("data", data=data, chunks=(7, 10))
+        f.create_dataset("sparse", shape=(20,), dtype="f8", chunks=(5,))
+        f["sparse"][12] = 1.0
+
+    out = kerchunk.hdf.SingleHdf5ToZarr(fn, inline_threshold=0).translate()
+    refs = out["refs"]
+    assert {k for k in refs if k.startswith("data/") and ".z" not in k} == {
+        f"data/{i}.{j}" for i in range(3) for j in range(3)
+    }
+    assert {k for k in refs if k.startswith("sparse/") and ".z" not in k} == {
+        "sparse/2"
+    }
+    fs = fsspec.filesystem("reference", fo=out)
+    z = zarr.open(fs.get_mapper())
+    assert (z.data[:] == data).all()
+
+
+def test_filters(tmpdir):
+    import h5py
+    import numcodecs
+    import ujson
+
+    fn = str(tmpdir.join("filters.h5"))
+    data = np.arange(100, dtype="f8")
+    with h5py.File(fn, "w") as f:
+        f.create_dataset(
+            "gz", data=data, chunks=(10,), compression="gzip", compression_opts=7
+        )
+        f.create_dataset("shuf", data=data, chunks=(10,), shuffle=True)
+        f.create_dataset("f32", data=data, chunks=(10,), fletcher32=True)
+        f.create_dataset("so", data=np.arange(100), chunks=(10,), scaleoffset=0)
+        f.create_dataset("lzf", data=data, chunks=(10,), compression="lzf")
+        sizes = []
+        f["f32"].id.chunk_iter(lambda c: sizes.append(c.size))
+
+    with pytest.warns(UserWarning) as w:
+        out = kerchunk.hdf.SingleHdf5ToZarr(fn, inline_threshold=0).translate()
+    messages = "".join(str(_.message) for _ in w)
+    assert "/so uses HDF5 scaleoffset filter" in messages
+    assert "/lzf uses szip or lzf compression" in messages
+    refs = out["refs"]
+    assert not any(k.startswith(("so/", "lzf/")) for k in refs)
+
+    meta = ujson.loads(refs["gz/.zarray"])
+    assert numcodecs.get_codec(meta["compressor"]) == numcodecs.Zlib(level=7)
+    meta = ujson.loads(refs["shuf/.zarray"])
+    assert meta["compressor"] is None
+    assert meta["filters"] == [{"id": "shuffle", "elementsize": 8}]
+    assert [refs[f"f32/{i}"][2] for i in range(10)] == [n - 4 for n in sizes]
+
+    fs = fsspec.filesystem("reference", fo=out)
+    z = zarr.open(fs.get_mapper())
+    for name in ["gz", "shuf", "f32"]:
+        assert (z[name][:] == data).all()
+
+
+def test_fill_value_cache(tmpdir):
+    import h5py
+    import ujson
+
+    fn = str(tmpdir.join("fill.h5"))
+    with h5py.File(fn, "w") as f:
+        for name, dtype in [("a", "f4"), ("b", "f8"), ("c", "f8"), ("d", "i2")]:
+            f.create_dataset(name, data=np.arange(10, dtype=dtype))
+            f[name].attrs["_FillValue"] = np.float64(-999)
+
+    h5 = kerchunk.hdf.SingleHdf5ToZarr(fn)
+    refs = h5.translate()["refs"]
+    fills = {k: ujson.loads(refs[f"{k}/.zarray"])["fill_value"] for k in "abcd"}
+    assert fills == {"a": -999.0, "b": -999.0, "c": -999.0, "d": -999}
+    assert isinstance(fills["a"], float) and isinstance(fills["d"], int)
+    # one entry per target dtype for the shared value; "c" reuses that of "b"
+    assert len(h5._fill_cache) == 3
+
+
+def test_no_chunk_iter_warns_once(tmpdir, monkeypatch):
+    import h5py
+    import warnings
+
+    fn = str(tmpdir.join("chunks.h5"))
+    with h5py.File(fn, "w") as f:
+        f.create_dataset("data", data=np.arange(30), chunks=(7,))
+
+    class OldDatasetID:
+        # only the per-chunk API of h5py<3.8
+        def __init__(self, dsid):
+            self.get_num_chunks = dsid.get_num_chunks
+            self.get_chunk_info = dsid.get_chunk_info
+
+    class OldDataset:
+        def __init__(self, dset):
+            self.shape, self.chunks = dset.shape, dset.chunks
+            self.id = OldDatasetID(dset.id)
+
+    monkeypatch.setattr(kerchunk.hdf, "_warned_chunk_iter", False)
+    h5 = SingleHdf5ToZarr(fn)
+    with h5py.File(fn) as f, warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter("always")
+        for _ in range(3):
+            keys, offsets, sizes = h5._storage_arrays(OldDataset(f["data"]))
+        expected = h5._storage_arrays(f["data"])
+    assert len(w) == 1 and "chunk_iter" in str(w[0].message)
+    assert keys.ravel().tolist() == [0, 1, 2, 3, 4]
+    assert (offsets == expected[1]).all() and (sizes == expected[2]).all()
+
+
+def test_storage_info(tmpdir):
+    import h5py
+
+    fn = str(tmpdir.join("info.h5"))
+    with h5py.File(fn, "w") as f:
+        f.create_dataset("chunked", data=np.arange(600).reshape(20, 30), chunks=(7, 10))
+        f.create_dataset("contiguous", data=np.arange(10))
+        f.create_dataset("scalar", data=1.0)
+        f.create_dataset("unwritten", shape=(10,), dtype="f8", chunks=(5,))
+        f.create_dataset("null", data=h5py.Empty("f8"))
+
+    h5 = SingleHdf5ToZarr(fn)
+    with h5py.File(fn) as f:
+        expected = {}
+        f["chunked"].id.chunk_iter(
+            lambda c: expected.update(
+                {
+                    (c.chunk_offset[0] // 7, c.chunk_offset[1] // 10): {
+                        "offset": c.byte_offset,
+                        "size": c.size,
+                    }
+                }
+            )
+        )
+        assert h5._storage_info(f["chunked"]) == expected
+        assert len(expected) == 9
+        dsid = f["contiguous"].id
+        assert h5._storage_info(f["contiguous"]) == {
+            (0,): {"offset": dsid.get_offset(), "size": 80}
+        }
+        assert list(h5._storage_info(f["scalar"])) == [(0,)]
+        assert h5._storage_info(f["unwritten"]) == {}
+        assert h5._storage_info(f["null"]) == {}
+
+
+def test_read_ranges():
+    import io
+
+    data = bytes(range(256)) * 1024
+    starts = [0, 10, 100, 200_000, 200_010]
+    ends = [5, 20, 150, 200_005, 200_100]
+    expected = [data[s:e] for s, e in zip(starts, ends)]
+    f = io.BytesIO(data)
+    f.seek(7)
+    assert kerchunk.hdf._read_ranges(f, starts, ends) == expected
+    assert f.tell() == 7
+
+    m = fsspec.filesystem("memory")
+    m.pipe("/ranges", data)
+    with m.open("/ranges") as f:
+        assert kerchunk.hdf._read_ranges(f, starts, ends) == expected
+
+
+def test_read_ranges_bytes_read():
+    import io
+
+    class CountingFile(io.BytesIO):
+        nbytes = 0
+
+        def read(self, n=-1):
+            out = super().read(n)
+            self.nbytes += len(out)
+            return out
+
+    # small wanted ranges separated by large unwanted ones
+    data = bytes(range(256)) * 2**14
+    starts = list(range(0, len(data) - 10, 8192))
+    ends = [s + 10 for s in starts]
+    f = CountingFile(data)
+    out = kerchunk.hdf._read_ranges(f, starts, ends)
+    assert out == [data[s:e] for s, e in zip(starts, ends)]
+    assert f.nbytes == 10 * len(starts)
+
+    # adjacent ranges are still merged, but never beyond max_block
+    f = CountingFile(data)
+    starts = list(range(0, 2**20, 100))
+    ends = [s + 100 for s in starts]
+    out = kerchunk.hdf._read_ranges(f, starts, ends, max_block=2**16)
+    assert out == [data[s:e] for s, e in zip(starts, ends)]
+    assert f.nbytes == ends[-1]
+    assert kerchunk.hdf._merge_ranges(starts, ends, 2**16, 2**16)[0][:2] == [
+        0,
+        65500,
+    ]
+
+
+def test_read_ranges_error():
+    class FailingFS:
+        def cat_ranges(self, paths, starts, ends):
+            return [FileNotFoundError(p) for p in paths]
+
+    class File:
+        fs = FailingFS()
+        path = "missing"
+
+    with pytest.raises(FileNotFoundError):
+        kerchunk.hdf._read_ranges(File(), [0], [10])
+
+
+def test_chunk_table_large_offsets():
+    table = kerchunk.hdf._ChunkTable(["file.h5"], capacity=2)
+    offsets = [0, 2**32 + 5, 2**40, 2**63 + 1]
+    table.extend([f"x/{i}" for i in range(4)], offsets, [100] * 4)
+    table.drop([1])
+    assert dict(table.items()) == {
+        "x/0": ["file.h5", 0, 100],
+        "x/2": ["file.h5", 2**40, 100],
+        "x/3": ["file.h5", 2**63 + 1, 100],
+    }
+    table.clear()
+    assert len(table) == 0 and len(table._offsets) == 2
+
+    table = kerchunk.hdf._ChunkTable(["a.h5", "b.h5"])
+    table.extend(["x/0", "x/1"], [0, 10], [10, 10], url_idx=[1, 0])
+    assert dict(table.items()) == {"x/0": ["b.h5", 0, 10], "x/1": ["a.h5", 10, 10]}
+
+
+def test_compound_attrs(tmpdir):
+    import h5py
+
+    fn = str(tmpdir.join("attrs.h5"))
+    dt = np.dtype([("a", "i4"), ("b", "f8")])
+    with h5py.File(fn, "w") as f:
+        f.attrs["one"] = np.array([(1, 2.0)], dtype=dt)
+        f.attrs["two"] = np.array([(1, 2.0), (3, 4.0)], dtype=dt)
+        f.attrs["name"] = np.array([b"DIMENSION_SCALE"])
+        f.attrs["other"] = "value"
+
+    out = kerchunk.hdf.SingleHdf5ToZarr(fn).translate()
+    z = zarr.open(fsspec.filesystem("reference", fo=out).get_mapper())
+    assert dict(z.attrs) == {"two": [[1, 2.0], [3, 4.0]], "other": "value"}
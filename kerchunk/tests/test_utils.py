@@ -5,6 +5,7 @@ import kerchunk.utils
 import kerchunk.zarr
 import numpy as np
 import pytest
+import ujson
 import zarr
 
 
@@ -88,11 +89,16 @@ def test_inline_array():
 
 
 def test_json():
-    data = {"a": "a", "b": b"b", "c": [None, None, None], "d": '{"key": 0}'}
+    data = {"a": "a", "b": b"b", "c": [None, None, None], "d/.zattrs": '{"key": 0}'}
     out = kerchunk.utils._encode_for_JSON(data)
-    expected = {"a": "a", "b": "b", "c": [None, None, None], "d": '{"key":0}'}
+    expected = {"a": "a", "b": "b", "c": [None, None, None], "d/.zattrs": '{"key":0}'}
     assert out == expected
 
+    # inlined data that happens to parse as JSON is left alone
+    data = {"a/0": b"1.50", "b/0": "[1, 2]", "c/0": b"true", "d/0": b'{"a": 1.50}'}
+    out = kerchunk.utils._encode_for_JSON(data)
+    assert out == {"a/0": "1.50", "b/0": "[1, 2]", "c/0": "true", "d/0": '{"a": 1.50}'}
+
 
 @pytest.mark.parametrize("chunks", [[10, 10], [5, 10]])
 def test_subchunk_exact(m, chunks):
@@ -168,3 +174,27 @@ def test_deflate_zip_archive(m):
 
     fs = fsspec.filesystem("reference", fo=refs2)
     assert dec.decode(fs.cat("b")) == data
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 10_000])
+def test_write_refs(batch_size):
+    refs = {
+        "version": 1,
+        "templates": {"u": "server.domain/path"},
+        "refs": {f"a/{i}": ["{{u}}", i, 10] for i in range(5)},
+    }
+    refs["refs"][".zattrs"] = '{"a": "b/c"}'
+    f = io.StringIO()
+    kerchunk.utils.write_refs(refs, f, batch_size=batch_size)
+    assert f.getvalue() == ujson.dumps(refs)
+
+    # "refs" need not be the last member
+    refs = {"refs": {"a/0": ["u", 0, 1], "a/1": ["u", 1, 1]}, "version": 1}
+    f = io.StringIO()
+    kerchunk.utils.write_refs(refs, f, batch_size=batch_size)
+    assert f.getvalue() == ujson.dumps(refs)
+
+    for refs in [{"refs": {}}, {"version": 1, "refs": {}}, {"a/0": ["u", 0, 1]}]:
+        f = io.StringIO()
+        kerchunk.utils.write_refs(refs, f, batch_size=batch_size)
+        assert f.getvalue() == ujson.dumps(refs)
@@ -53,6 +53,45 @@ def consolidate(refs):
     return {"version": 1, "refs": out}
 
 
+def write_refs(refs, f, batch_size=10_000):
+    """Write a reference set as JSON to an open text file
+
+    Produces the same document as ``ujson.dump(refs, f)``, but the
+    ``"refs"`` member is encoded and written in batches of entries, so that
+    the JSON text of a large reference set is never held in memory all at
+    once.
+
+    Parameters
+    ----------
+    refs: dict
+        Reference set, optionally with a "refs" member
+    f: file-like
+        Open in text mode for writing
+    batch_size: int
+        Number of references to encode per write
+    """
+    if not isinstance(refs.get("refs"), dict):
+        ujson.dump(refs, f)
+        return
+    f.write("{")
+    for i, (key, value) in enumerate(refs.items()):
+        f.write(("," if i else "") + ujson.dumps(key) + ":")
+        if key != "refs":
+            f.write(ujson.dumps(value))
+            continue
+        f.write("{")
+        items = iter(value.items())
+        sep = ""
+        while True:
+            batch = dict(itertools.islice(items, batch_size))
+            if not batch:
+                break
+            f.write(sep + ujson.dumps(batch)[1:-1])
+            sep = ","
+        f.write("}")
+    f.write("}")
+
+
 def rename_target(refs, renames):
     """Utility to change URLs in a reference set in a predictable way
 
@@ -113,20 +152,26 @@ def rename_target_files(
     if storage_options_out is None:
         storage_options_out = storage_options_in
     with fsspec.open(url_out, mode="wt", **(storage_options_out or {})) as f:
-        ujson.dump(new, f)
+        write_refs(new, f)
+
+
+_ZARR_METADATA_KEYS = {".zarray", ".zattrs", ".zgroup", ".zmetadata"}
 
 
 def _encode_for_JSON(store):
     """Make store JSON encodable"""
-    for k, v in store.copy().items():
+    # only the values of existing keys change, so no need to iterate over a copy
+    for k, v in store.items():
         if isinstance(v, list):
             continue
         else:
-            try:
-                # minify JSON
-                v = ujson.dumps(ujson.loads(v))
-            except (ValueError, TypeError):
-                pass
+            if k.rsplit("/", 1)[-1] in _ZARR_METADATA_KEYS:
+                # minify JSON metadata; inlined chunk data is neither parsed
+                # nor altered
+                try:
+                    v = ujson.dumps(ujson.loads(v))
+                except (ValueError, TypeError):
+                    pass
             try:
                 store[k] = v.decode() if isinstance(v, bytes) else v
             except UnicodeDecodeError: